@@ -7,6 +7,8 @@ Usage:
     python3 cli_poc.py
 """
 
+import asyncio
+
 from query_engine import QueryEngine
 
 
@@ -20,6 +22,16 @@ def main():
 
     engine = QueryEngine()
 
+    # The prompt loop stays synchronous so Ctrl-C at the prompt is a plain
+    # KeyboardInterrupt; each answer runs on one shared event loop.
+    try:
+        with asyncio.Runner() as runner:
+            repl(engine, runner)
+    finally:
+        engine.close()
+
+
+def repl(engine: QueryEngine, runner: asyncio.Runner):
     while True:
         try:
             question = input("⚾ ").strip()
@@ -34,9 +46,14 @@ def main():
             break
 
         print()
-        answer = engine.ask(question)
-        print(answer)
+        runner.run(print_answer(engine, question))
         print()
+        print()
+
+
+async def print_answer(engine: QueryEngine, question: str):
+    async for chunk in engine.ask_stream(question):
+        print(chunk, end="", flush=True)
 
 
 if __name__ == "__main__":
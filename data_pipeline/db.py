@@ -0,0 +1,39 @@
+"""
+Shared SQLite helpers for the data pipeline scripts.
+
+The pipeline is write-heavy (full reloads of stats, game logs, and streaks),
+so connections are tuned for bulk ingest while the scripts run and switched
+back to a rollback journal before closing. The iOS app bundles the database
+file and opens it read-only, which doesn't work with a WAL-mode file.
+"""
+
+import sqlite3
+
+# SQLite's default cap on bound parameters per statement
+MAX_SQL_PARAMS = 999
+
+# Prepared statements kept per connection (sqlite3 default is 128)
+STATEMENT_CACHE_SIZE = 256
+
+
+def connect(db_path):
+    """Open a pipeline connection with a larger statement cache and ingest PRAGMAs."""
+    conn = sqlite3.connect(db_path, cached_statements=STATEMENT_CACHE_SIZE)
+    tune_sqlite(conn)
+    return conn
+
+
+def tune_sqlite(conn):
+    """Apply bulk-ingest PRAGMAs: WAL, relaxed fsync, large cache, in-memory temp."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-200000")      # ~200 MB page cache
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")     # 256 MB
+
+
+def close_sqlite(conn):
+    """Checkpoint the WAL back into the main file and close the connection."""
+    conn.commit()
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
@@ -1,5 +1,5 @@
 """
-Streak detection: Uses change-point detection (ruptures PELT) to find
+Streak detection: Uses change-point detection (PELT) to find
 hot and cold streaks in each player's season.
 
 Reads game logs from SQLite, detects performance shifts, and stores
@@ -9,10 +9,16 @@ Usage:
     python3 detect_streaks.py
 """
 
-import sqlite3
 import os
+from functools import lru_cache
+from itertools import groupby
+from multiprocessing import Pool
+from operator import itemgetter
+
 import numpy as np
-import ruptures as rpt
+from numba import njit
+
+from db import MAX_SQL_PARAMS, connect, close_sqlite
 
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "baseball_stats.db")
 
@@ -21,13 +27,26 @@ MIN_SEGMENT_SIZE = 7   # Minimum games in a streak segment
 PENALTY = 3            # Higher = fewer change points (less sensitive)
 ROLLING_WINDOW = 5     # Rolling average window to smooth noise
 
+# Streak rows are buffered and flushed to SQLite in batches of this size
+INSERT_BATCH_SIZE = 5000
+
+STREAK_COLUMNS = (
+    "player_id", "season", "start_date", "end_date", "num_games",
+    "batting_avg", "obp", "slg", "ops", "home_runs",
+    "hits", "at_bats", "walks", "strikeouts", "performance",
+)
+SENSITIVE_STREAK_COLUMNS = STREAK_COLUMNS + ("season_ops",)
+
+# Player-seasons handed to each worker process at a time
+POOL_CHUNKSIZE = 16
+
 
 def create_streaks_table(conn):
     """Create the streaks table."""
     cursor = conn.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS streaks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id INTEGER PRIMARY KEY,
             player_id TEXT NOT NULL,
             season INTEGER NOT NULL,
             start_date TEXT NOT NULL,
@@ -46,101 +65,209 @@ def create_streaks_table(conn):
             FOREIGN KEY (player_id) REFERENCES players(player_id)
         )
     """)
+    conn.commit()
+
+
+def create_streaks_indexes(conn):
+    """Create the streaks indexes. Run after the table is loaded."""
+    cursor = conn.cursor()
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_player ON streaks(player_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_player_season ON streaks(player_id, season)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_player_season ON streaks(player_id, season, start_date)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_performance ON streaks(performance)")
     conn.commit()
 
 
-def get_player_seasons(conn):
-    """Get all player-season combos that have game logs."""
+@lru_cache(maxsize=None)
+def multi_row_insert_sql(table, columns, n_rows):
+    """INSERT statement with n_rows VALUES groups, built once per shape."""
+    placeholders = "(" + ", ".join("?" * len(columns)) + ")"
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([placeholders] * n_rows)
+
+
+def insert_rows(cursor, table, columns, rows):
+    """Insert rows with multi-row VALUES statements.
+
+    Packs as many rows into each INSERT as the parameter limit allows, so
+    SQLite parses one statement per chunk instead of one per row.
+    """
+    rows_per_stmt = MAX_SQL_PARAMS // len(columns)
+    for i in range(0, len(rows), rows_per_stmt):
+        chunk = rows[i:i + rows_per_stmt]
+        sql = multi_row_insert_sql(table, columns, len(chunk))
+        cursor.execute(sql, [v for row in chunk for v in row])
+
+
+def get_all_game_logs(conn):
+    """Yield (player_id, season, games) for every player-season with game logs.
+
+    Streams one query over the table and groups rows by player-season; each
+    game is (date, AB, H, 2B, 3B, HR, BB, SO, PA), ordered by date.
+    """
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT DISTINCT player_id, season
+        SELECT player_id, season, date, at_bats, hits, doubles, triples,
+               home_runs, walks, strikeouts, plate_appearances
         FROM game_batting_logs
-        ORDER BY season, player_id
+        ORDER BY season, player_id, date
     """)
-    return cursor.fetchall()
+    for (player_id, season), rows in groupby(cursor, key=itemgetter(0, 1)):
+        yield player_id, season, [row[2:] for row in rows]
 
 
-def get_game_logs(conn, player_id, season):
-    """Get game logs for a player-season, ordered by date."""
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT date, at_bats, hits, doubles, triples, home_runs,
-               walks, strikeouts, plate_appearances
-        FROM game_batting_logs
-        WHERE player_id = ? AND season = ?
-        ORDER BY date ASC
-    """, (player_id, season))
-    return cursor.fetchall()
-
-
-def compute_game_ops(games):
-    """Compute per-game OPS values from game log rows."""
-    ops_values = []
-    for g in games:
-        date, ab, h, doubles, triples, hr, bb, so, pa = g
-        if ab and ab > 0 and pa and pa > 0:
-            # SLG = total bases / AB
-            tb = (h - doubles - triples - hr) + 2 * doubles + 3 * triples + 4 * hr
-            slg = tb / ab
-            # OBP = (H + BB) / PA  (simplified — no HBP/SF in game logs)
-            obp = (h + bb) / pa
-            ops_values.append(obp + slg)
-        else:
-            ops_values.append(0.0)
-    return np.array(ops_values)
-
-
-def detect_change_points(signal, min_size=MIN_SEGMENT_SIZE, penalty=PENALTY):
-    """Run PELT change-point detection on a signal."""
-    if len(signal) < min_size * 2:
+def game_stat_array(games):
+    """Convert game log rows to a float array of counting stats.
+
+    Columns: AB, H, 2B, 3B, HR, BB, SO, PA (NULLs become 0).
+    """
+    return np.array([[v or 0 for v in g[1:]] for g in games], dtype=np.float64).reshape(-1, 8)
+
+
+def compute_game_ops(stats):
+    """Compute per-game OPS values from a game_stat_array."""
+    ab, h, doubles, triples, hr, bb, so, pa = stats.T
+    valid = (ab > 0) & (pa > 0)
+    # SLG = total bases / AB
+    tb = (h - doubles - triples - hr) + 2 * doubles + 3 * triples + 4 * hr
+    slg = np.divide(tb, ab, out=np.zeros_like(ab), where=valid)
+    # OBP = (H + BB) / PA  (simplified — no HBP/SF in game logs)
+    obp = np.divide(h + bb, pa, out=np.zeros_like(pa), where=valid)
+    return obp + slg
+
+
+@njit(cache=True)
+def rolling_mean(x, window):
+    """Centered rolling mean, zero-padded at the edges (np.convolve mode='same').
+
+    O(n): keeps a running window sum instead of re-summing each window.
+    """
+    n = x.shape[0]
+    out = np.empty(n)
+    lo = window // 2
+    hi = (window - 1) // 2
+
+    s = 0.0
+    for j in range(min(n, hi)):
+        s += x[j]
+    for i in range(n):
+        if i + hi < n:
+            s += x[i + hi]
+        if i - lo - 1 >= 0:
+            s -= x[i - lo - 1]
+        out[i] = s / window
+    return out
+
+
+@njit(cache=True)
+def pelt_l2(signal, pen, min_size):
+    """PELT with an L2 (squared deviation) segment cost.
+
+    Same search as ruptures' Pelt(model="l2", jump=1): candidate change points
+    are pruned once they can no longer beat the current optimum. Segment costs
+    are O(1) from prefix sums of x and x^2. Returns the sorted breakpoints,
+    ending with len(signal).
+    """
+    n = signal.shape[0]
+    s1 = np.zeros(n + 1)
+    s2 = np.zeros(n + 1)
+    for i in range(n):
+        s1[i + 1] = s1[i] + signal[i]
+        s2[i + 1] = s2[i] + signal[i] * signal[i]
+
+    best_cost = np.zeros(n + 1)
+    last_bkp = np.zeros(n + 1, dtype=np.int64)
+    admissible = np.empty(n + 1, dtype=np.int64)
+    totals = np.empty(n + 1)
+    n_adm = 0
+
+    for end in range(min_size, n + 1):
+        # A new start point becomes available once it leaves room for a full segment
+        start = end - min_size
+        if start == 0 or start >= min_size:
+            admissible[n_adm] = start
+            n_adm += 1
+
+        best = np.inf
+        best_start = 0
+        for k in range(n_adm):
+            t = admissible[k]
+            seg_sum = s1[end] - s1[t]
+            cost = (s2[end] - s2[t]) - seg_sum * seg_sum / (end - t)
+            totals[k] = best_cost[t] + cost + pen
+            if totals[k] < best:
+                best = totals[k]
+                best_start = t
+        best_cost[end] = best
+        last_bkp[end] = best_start
+
+        # Prune start points that can't be optimal for any later end
+        kept = 0
+        for k in range(n_adm):
+            if totals[k] <= best + pen:
+                admissible[kept] = admissible[k]
+                kept += 1
+        n_adm = kept
+
+    # Walk back from the end to recover the breakpoints
+    path = np.empty(n + 1, dtype=np.int64)
+    count = 0
+    end = n
+    while end > 0:
+        path[count] = end
+        count += 1
+        end = last_bkp[end]
+    return path[:count][::-1].copy()
+
+
+def smooth_signal(signal):
+    """Smooth a per-game signal with a rolling average to reduce game-to-game noise.
+
+    Returns a C-contiguous float64 array that pelt_l2 uses without copying.
+    """
+    return rolling_mean(np.ascontiguousarray(signal, dtype=np.float64), ROLLING_WINDOW)
+
+
+def detect_change_points(smoothed, min_size=MIN_SEGMENT_SIZE, penalty=PENALTY):
+    """Run PELT change-point detection on an already smoothed signal."""
+    if len(smoothed) < min_size * 2:
         # Not enough data for meaningful detection
-        return [len(signal)]
-
-    # Smooth with rolling average to reduce game-to-game noise
-    smoothed = np.convolve(signal, np.ones(ROLLING_WINDOW) / ROLLING_WINDOW, mode='same')
-    smoothed = smoothed.reshape(-1, 1)
-
-    algo = rpt.Pelt(model="l2", min_size=min_size, jump=1)
-    algo.fit(smoothed)
-    breakpoints = algo.predict(pen=penalty)
-    return breakpoints
-
-
-def compute_segment_stats(games, start_idx, end_idx):
-    """Compute aggregate stats for a segment of games."""
-    segment = games[start_idx:end_idx]
-    total_ab = sum(g[1] or 0 for g in segment)
-    total_h = sum(g[2] or 0 for g in segment)
-    total_2b = sum(g[3] or 0 for g in segment)
-    total_3b = sum(g[4] or 0 for g in segment)
-    total_hr = sum(g[5] or 0 for g in segment)
-    total_bb = sum(g[6] or 0 for g in segment)
-    total_so = sum(g[7] or 0 for g in segment)
-    total_pa = sum(g[8] or 0 for g in segment)
-
-    avg = total_h / total_ab if total_ab > 0 else 0
-    obp = (total_h + total_bb) / total_pa if total_pa > 0 else 0
-    tb = (total_h - total_2b - total_3b - total_hr) + 2 * total_2b + 3 * total_3b + 4 * total_hr
-    slg = tb / total_ab if total_ab > 0 else 0
+        return [len(smoothed)]
+
+    breakpoints = pelt_l2(smoothed, penalty, min_size)
+    return breakpoints.tolist()
+
+
+def compute_segment_stats(games, stats, breakpoints):
+    """Compute aggregate stats for every segment ending at the given breakpoints.
+
+    Segment totals come from one np.add.reduceat over the game_stat_array.
+    """
+    ends = np.minimum(np.asarray(breakpoints), len(games))
+    starts = np.r_[0, ends[:-1]]
+    ab, h, doubles, triples, hr, bb, so, pa = np.add.reduceat(stats, starts, axis=0).T
+
+    avg = np.divide(h, ab, out=np.zeros_like(ab), where=ab > 0)
+    obp = np.divide(h + bb, pa, out=np.zeros_like(pa), where=pa > 0)
+    tb = (h - doubles - triples - hr) + 2 * doubles + 3 * triples + 4 * hr
+    slg = np.divide(tb, ab, out=np.zeros_like(ab), where=ab > 0)
     ops = obp + slg
 
-    return {
-        "start_date": segment[0][0],
-        "end_date": segment[-1][0],
-        "num_games": len(segment),
-        "batting_avg": round(avg, 3),
-        "obp": round(obp, 3),
-        "slg": round(slg, 3),
-        "ops": round(ops, 3),
-        "home_runs": total_hr,
-        "hits": total_h,
-        "at_bats": total_ab,
-        "walks": total_bb,
-        "strikeouts": total_so,
-    }
+    segments = []
+    for i, (start_idx, end_idx) in enumerate(zip(starts, ends)):
+        segments.append({
+            "start_date": games[start_idx][0],
+            "end_date": games[end_idx - 1][0],
+            "num_games": int(end_idx - start_idx),
+            "batting_avg": round(float(avg[i]), 3),
+            "obp": round(float(obp[i]), 3),
+            "slg": round(float(slg[i]), 3),
+            "ops": round(float(ops[i]), 3),
+            "home_runs": int(hr[i]),
+            "hits": int(h[i]),
+            "at_bats": int(ab[i]),
+            "walks": int(bb[i]),
+            "strikeouts": int(so[i]),
+        })
+    return segments
 
 
 def label_performance(segment_ops, season_ops):
@@ -156,65 +283,11 @@ def label_performance(segment_ops, season_ops):
         return "average"
 
 
-def detect_all_streaks(conn):
-    """Run streak detection for all player-seasons and store results."""
-    create_streaks_table(conn)
-    cursor = conn.cursor()
-
-    # Clear existing streaks
-    cursor.execute("DELETE FROM streaks")
-    conn.commit()
-
-    player_seasons = get_player_seasons(conn)
-    print(f"Running streak detection for {len(player_seasons)} player-seasons...")
-
-    total_streaks = 0
-    for i, (player_id, season) in enumerate(player_seasons):
-        games = get_game_logs(conn, player_id, season)
-        if len(games) < MIN_SEGMENT_SIZE * 2:
-            continue
-
-        # Compute per-game OPS
-        ops_signal = compute_game_ops(games)
-        season_ops = np.mean(ops_signal)
-
-        # Detect change points
-        breakpoints = detect_change_points(ops_signal)
-
-        # Build segments
-        start_idx = 0
-        for end_idx in breakpoints:
-            if end_idx > len(games):
-                end_idx = len(games)
-
-            stats = compute_segment_stats(games, start_idx, end_idx)
-            performance = label_performance(stats["ops"], season_ops)
-
-            cursor.execute("""
-                INSERT INTO streaks (
-                    player_id, season, start_date, end_date, num_games,
-                    batting_avg, obp, slg, ops, home_runs,
-                    hits, at_bats, walks, strikeouts, performance
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                player_id, season, stats["start_date"], stats["end_date"],
-                stats["num_games"], stats["batting_avg"], stats["obp"],
-                stats["slg"], stats["ops"], stats["home_runs"],
-                stats["hits"], stats["at_bats"], stats["walks"],
-                stats["strikeouts"], performance,
-            ))
-            total_streaks += 1
-            start_idx = end_idx
-
-        if (i + 1) % 100 == 0:
-            conn.commit()
-            print(f"  Processed {i + 1}/{len(player_seasons)} player-seasons ({total_streaks} streaks)...")
-
-    conn.commit()
-    print(f"Done! Detected {total_streaks} streak segments.")
-
-
 # --- Tier 2: Sensitive streaks (precomputed fallback) ---
+#
+# Player-seasons with a single segment at PENALTY get a second PELT run at
+# SENSITIVE_PENALTY on the same smoothed signal; only 7-30 game segments are
+# kept, in streaks_sensitive.
 
 SENSITIVE_PENALTY = 1.5
 SENSITIVE_MAX_SEGMENT = 30
@@ -225,7 +298,7 @@ def create_streaks_sensitive_table(conn):
     cursor = conn.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS streaks_sensitive (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id INTEGER PRIMARY KEY,
             player_id TEXT NOT NULL,
             season INTEGER NOT NULL,
             start_date TEXT NOT NULL,
@@ -245,85 +318,119 @@ def create_streaks_sensitive_table(conn):
             FOREIGN KEY (player_id) REFERENCES players(player_id)
         )
     """)
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_sens_player ON streaks_sensitive(player_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_sens_player_season ON streaks_sensitive(player_id, season)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_sens_performance ON streaks_sensitive(performance)")
     conn.commit()
 
 
-def detect_sensitive_streaks(conn):
-    """Second pass: run PELT with lower penalty (1.5) and keep only 7-30 game segments.
-
-    Only processes player-seasons that had a single segment (no change points)
-    in the primary (penalty=3) detection pass.
-    """
-    create_streaks_sensitive_table(conn)
+def create_streaks_sensitive_indexes(conn):
+    """Create the streaks_sensitive indexes. Run after the table is loaded."""
     cursor = conn.cursor()
-
-    # Clear existing sensitive streaks
-    cursor.execute("DELETE FROM streaks_sensitive")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_sens_player ON streaks_sensitive(player_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_sens_player_season ON streaks_sensitive(player_id, season, start_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_streaks_sens_performance ON streaks_sensitive(performance)")
     conn.commit()
 
-    # Find player-seasons with exactly 1 streak segment (no change points detected)
-    cursor.execute("""
-        SELECT player_id, season, COUNT(*) as seg_count
-        FROM streaks
-        GROUP BY player_id, season
-        HAVING seg_count = 1
-    """)
-    single_segment_players = cursor.fetchall()
-    print(f"Running sensitive streak detection for {len(single_segment_players)} single-segment player-seasons...")
 
-    total_sensitive = 0
-    for i, (player_id, season, _) in enumerate(single_segment_players):
-        games = get_game_logs(conn, player_id, season)
-        if len(games) < MIN_SEGMENT_SIZE * 2:
-            continue
-
-        ops_signal = compute_game_ops(games)
-        season_ops = float(np.mean(ops_signal))
-
-        # Run PELT with lower penalty
-        breakpoints = detect_change_points(ops_signal, min_size=MIN_SEGMENT_SIZE, penalty=SENSITIVE_PENALTY)
-
-        # Build segments, only keep 7-30 game segments
-        start_idx = 0
-        for end_idx in breakpoints:
-            if end_idx > len(games):
-                end_idx = len(games)
-
-            num_games = end_idx - start_idx
-            if MIN_SEGMENT_SIZE <= num_games <= SENSITIVE_MAX_SEGMENT:
-                stats = compute_segment_stats(games, start_idx, end_idx)
-                performance = label_performance(stats["ops"], season_ops)
+def process_player_season(task):
+    """Detect primary and sensitive streaks for one player-season. Runs in a worker process.
 
-                cursor.execute("""
-                    INSERT INTO streaks_sensitive (
-                        player_id, season, start_date, end_date, num_games,
-                        batting_avg, obp, slg, ops, home_runs,
-                        hits, at_bats, walks, strikeouts, performance, season_ops
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+    Returns (player_id, season, rows, sensitive_rows) with rows ready for the
+    streaks and streaks_sensitive INSERTs.
+    """
+    player_id, season, games = task
+
+    # Compute per-game OPS and smooth it once for both PELT runs
+    game_stats = game_stat_array(games)
+    ops_signal = compute_game_ops(game_stats)
+    season_ops = float(np.mean(ops_signal))
+    smoothed = smooth_signal(ops_signal)
+
+    # Detect change points
+    breakpoints = detect_change_points(smoothed)
+
+    # Build segments
+    rows = []
+    for stats in compute_segment_stats(games, game_stats, breakpoints):
+        performance = label_performance(stats["ops"], season_ops)
+        rows.append((
+            player_id, season, stats["start_date"], stats["end_date"],
+            stats["num_games"], stats["batting_avg"], stats["obp"],
+            stats["slg"], stats["ops"], stats["home_runs"],
+            stats["hits"], stats["at_bats"], stats["walks"],
+            stats["strikeouts"], performance,
+        ))
+
+    # No change points: rerun PELT with the lower penalty, keep only 7-30 game segments
+    sensitive_rows = []
+    if len(rows) == 1:
+        breakpoints = detect_change_points(smoothed, penalty=SENSITIVE_PENALTY)
+        for stats in compute_segment_stats(games, game_stats, breakpoints):
+            if MIN_SEGMENT_SIZE <= stats["num_games"] <= SENSITIVE_MAX_SEGMENT:
+                performance = label_performance(stats["ops"], season_ops)
+                sensitive_rows.append((
                     player_id, season, stats["start_date"], stats["end_date"],
                     stats["num_games"], stats["batting_avg"], stats["obp"],
                     stats["slg"], stats["ops"], stats["home_runs"],
                     stats["hits"], stats["at_bats"], stats["walks"],
                     stats["strikeouts"], performance, round(season_ops, 3),
                 ))
-                total_sensitive += 1
 
-            start_idx = end_idx
+    return player_id, season, rows, sensitive_rows
+
+
+def detect_all_streaks(conn):
+    """Run streak detection for all player-seasons and store results.
+
+    Fills both tiers in one pass: streaks (penalty=3) for every player-season
+    and streaks_sensitive (penalty=1.5) for those with no change points.
+    """
+    cursor = conn.cursor()
 
-        if (i + 1) % 100 == 0:
-            conn.commit()
-            print(f"  Processed {i + 1}/{len(single_segment_players)} player-seasons ({total_sensitive} sensitive streaks)...")
+    # Full reload: recreating the tables also leaves them unindexed until the load is done
+    cursor.execute("DROP TABLE IF EXISTS streaks")
+    cursor.execute("DROP TABLE IF EXISTS streaks_sensitive")
+    conn.commit()
+    create_streaks_table(conn)
+    create_streaks_sensitive_table(conn)
+
+    tasks = [
+        (player_id, season, games)
+        for player_id, season, games in get_all_game_logs(conn)
+        if len(games) >= MIN_SEGMENT_SIZE * 2
+    ]
+    print(f"Running streak detection for {len(tasks)} player-seasons...")
 
+    pending = []
+    pending_sensitive = []
+    total_streaks = 0
+    total_sensitive = 0
+    with Pool() as pool:
+        results = pool.imap_unordered(process_player_season, tasks, chunksize=POOL_CHUNKSIZE)
+        for i, (_, _, rows, sensitive_rows) in enumerate(results):
+            pending.extend(rows)
+            pending_sensitive.extend(sensitive_rows)
+            total_streaks += len(rows)
+            total_sensitive += len(sensitive_rows)
+
+            if len(pending) + len(pending_sensitive) >= INSERT_BATCH_SIZE:
+                insert_rows(cursor, "streaks", STREAK_COLUMNS, pending)
+                insert_rows(cursor, "streaks_sensitive", SENSITIVE_STREAK_COLUMNS, pending_sensitive)
+                conn.commit()
+                pending.clear()
+                pending_sensitive.clear()
+
+            if (i + 1) % 100 == 0:
+                print(f"  Processed {i + 1}/{len(tasks)} player-seasons "
+                      f"({total_streaks} streaks, {total_sensitive} sensitive streaks)...")
+
+    insert_rows(cursor, "streaks", STREAK_COLUMNS, pending)
+    insert_rows(cursor, "streaks_sensitive", SENSITIVE_STREAK_COLUMNS, pending_sensitive)
     conn.commit()
-    print(f"Done! Detected {total_sensitive} sensitive streak segments.")
+    create_streaks_indexes(conn)
+    create_streaks_sensitive_indexes(conn)
+    print(f"Done! Detected {total_streaks} streak segments and {total_sensitive} sensitive streak segments.")
 
 
 if __name__ == "__main__":
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     detect_all_streaks(conn)
-    detect_sensitive_streaks(conn)
-    conn.close()
+    close_sqlite(conn)
@@ -12,16 +12,21 @@ Usage:
 
 import json
 import re
-import sqlite3
 import sys
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pybaseball
 from pybaseball import batting_stats
 
+from db import MAX_SQL_PARAMS, connect, close_sqlite
+
 
 DEFAULT_START = 2024
 DEFAULT_END = 2025
@@ -32,9 +37,41 @@ DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "baseball_sta
 SPLIT_VS_LHP = 13
 SPLIT_VS_RHP = 14
 
+# Game log scraping: concurrent requests, capped overall request rate
+GAME_LOG_WORKERS = 12
+GAME_LOG_REQUESTS_PER_SEC = 8
+GAME_LOG_BATCH_SIZE = 2000
+
+# Shared FanGraphs HTTP session: keep-alive connection pool, retries on throttling/5xx
+REQUEST_TIMEOUT = 30
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "stat-chat/1.0"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+# Game date inside the FanGraphs game-log "Date" HTML link
+GAME_DATE_RE = re.compile(r'date=(\d{4}-\d{2}-\d{2})')
+
+
+# Secondary indexes, built after the bulk load (see create_indexes)
+INDEXES = [
+    ("idx_stats_player", "season_batting_stats(player_id)"),
+    ("idx_stats_season", "season_batting_stats(season)"),
+    ("idx_stats_player_season", "season_batting_stats(player_id, season)"),
+    ("idx_splits_player", "platoon_splits(player_id)"),
+    ("idx_splits_player_season", "platoon_splits(player_id, season)"),
+    ("idx_splits_split", "platoon_splits(split)"),
+    ("idx_gamelogs_player", "game_batting_logs(player_id)"),
+    ("idx_gamelogs_player_season", "game_batting_logs(player_id, season)"),
+    ("idx_gamelogs_date", "game_batting_logs(date)"),
+]
+
 
 def create_tables(conn):
-    """Create the SQLite schema."""
+    """Create the SQLite tables. Indexes are created separately by create_indexes."""
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -135,16 +172,32 @@ def create_tables(conn):
         )
     """)
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stats_player ON season_batting_stats(player_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stats_season ON season_batting_stats(season)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stats_player_season ON season_batting_stats(player_id, season)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_splits_player ON platoon_splits(player_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_splits_player_season ON platoon_splits(player_id, season)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_splits_split ON platoon_splits(split)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_gamelogs_player ON game_batting_logs(player_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_gamelogs_player_season ON game_batting_logs(player_id, season)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_gamelogs_date ON game_batting_logs(date)")
+    # Bookkeeping: when each player-season's game log was last pulled
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS game_log_pulls (
+            player_id TEXT NOT NULL,
+            season INTEGER NOT NULL,
+            pulled_at TEXT NOT NULL,
+            PRIMARY KEY (player_id, season)
+        )
+    """)
+
+    conn.commit()
+
+
+def drop_indexes(conn):
+    """Drop secondary indexes so a reload doesn't maintain them row by row."""
+    cursor = conn.cursor()
+    for name, _ in INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+
 
+def create_indexes(conn):
+    """Create secondary indexes. Run after all rows are loaded."""
+    cursor = conn.cursor()
+    for name, target in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
     conn.commit()
 
 
@@ -181,7 +234,7 @@ def pull_splits_from_fangraphs(season, split_code, split_name):
         "sortdir": "default",
         "sortstat": "WAR",
     }
-    resp = requests.get(url, params=params)
+    resp = SESSION.get(url, params=params, timeout=REQUEST_TIMEOUT)
     resp.raise_for_status()
     result = resp.json()
     rows = result["data"] if isinstance(result, dict) else result
@@ -206,107 +259,112 @@ def pull_all_splits(start_season, end_season):
     return all_splits
 
 
-def get_val(row, key, available_keys, default=None):
-    """Safely get a value from a row, returning default for missing/NaN."""
-    if key in available_keys:
-        val = row.get(key)
-        if val is not None and str(val) != "nan":
-            return val
-    return default
+# pybaseball column -> season_batting_stats column ("name" only feeds the players table)
+SEASON_STATS_COLUMN_MAP = {
+    "IDfg": "player_id", "Name": "name", "Season": "season", "Team": "team",
+    "Age": "age", "G": "games", "PA": "plate_appearances", "AB": "at_bats",
+    "H": "hits", "2B": "doubles", "3B": "triples", "HR": "home_runs",
+    "R": "runs", "RBI": "rbi", "SB": "stolen_bases", "CS": "caught_stealing",
+    "BB": "walks", "SO": "strikeouts", "HBP": "hit_by_pitch",
+    "SF": "sacrifice_flies", "IBB": "intentional_walks",
+    "AVG": "batting_avg", "OBP": "obp", "SLG": "slg", "OPS": "ops",
+    "ISO": "iso", "BABIP": "babip", "wRC+": "wrc_plus", "WAR": "war",
+}
+
+# FanGraphs splits API field -> platoon_splits column
+SPLITS_COLUMN_MAP = {
+    "playerid": "player_id", "Name": "name", "Team": "team",
+    "_season": "season", "_split": "split",
+    "PA": "plate_appearances", "AB": "at_bats", "H": "hits",
+    "2B": "doubles", "3B": "triples", "HR": "home_runs", "RBI": "rbi",
+    "BB": "walks", "SO": "strikeouts",
+    "AVG": "batting_avg", "OBP": "obp", "SLG": "slg", "OPS": "ops",
+    "ISO": "iso", "BABIP": "babip", "wRC+": "wrc_plus",
+}
+
+
+SEASON_STATS_COLUMNS = ", ".join(c for c in SEASON_STATS_COLUMN_MAP.values() if c != "name")
+MERGE_SEASON_STATS_SQL = f"""
+    INSERT OR REPLACE INTO season_batting_stats ({SEASON_STATS_COLUMNS})
+    SELECT {SEASON_STATS_COLUMNS} FROM season_batting_stats_stg
+"""
+
+SPLITS_COLUMNS = ", ".join(c for c in SPLITS_COLUMN_MAP.values() if c not in ("name", "team"))
+MERGE_SPLITS_SQL = f"""
+    INSERT OR REPLACE INTO platoon_splits ({SPLITS_COLUMNS})
+    SELECT {SPLITS_COLUMNS} FROM platoon_splits_stg
+"""
+
+
+def to_staging_table(conn, df, table):
+    """Write a dataframe to a scratch table using pandas' multi-row INSERTs.
+
+    pandas writes NaN as NULL. Chunks are sized to stay under the SQLite
+    parameter limit.
+    """
+    df.to_sql(
+        table, conn, if_exists="replace", index=False,
+        method="multi", chunksize=MAX_SQL_PARAMS // len(df.columns),
+    )
 
 
 def load_season_stats(conn, data):
     """Load season stats dataframe into SQLite."""
     cursor = conn.cursor()
-    available_cols = set(data.columns)
-    players_added = set()
-    rows_inserted = 0
 
-    for _, row in data.iterrows():
-        player_id = str(row.get("IDfg", ""))
-        name = row.get("Name", "")
-        team = row.get("Team", "")
-        season = int(row.get("Season", 0))
+    # Missing columns come back as NaN
+    df = data.reindex(columns=list(SEASON_STATS_COLUMN_MAP)).rename(columns=SEASON_STATS_COLUMN_MAP)
+    df = df[df["player_id"].notna() & df["name"].notna() & (df["name"] != "")].copy()
+    df["player_id"] = df["player_id"].astype(str)
+    df["season"] = df["season"].astype(int)
 
-        if not player_id or not name:
-            continue
+    to_staging_table(conn, df, "season_batting_stats_stg")
 
-        if player_id not in players_added:
-            cursor.execute(
-                "INSERT OR REPLACE INTO players (player_id, name, team) VALUES (?, ?, ?)",
-                (player_id, name, team),
-            )
-            players_added.add(player_id)
-
-        gv = lambda key, default=None: get_val(row, key, available_cols, default)
-
-        cursor.execute("""
-            INSERT OR REPLACE INTO season_batting_stats (
-                player_id, season, team, age, games, plate_appearances,
-                at_bats, hits, doubles, triples, home_runs, runs, rbi,
-                stolen_bases, caught_stealing, walks, strikeouts,
-                hit_by_pitch, sacrifice_flies, intentional_walks,
-                batting_avg, obp, slg, ops, iso, babip, wrc_plus, war
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            player_id, season, team,
-            gv("Age"), gv("G"), gv("PA"),
-            gv("AB"), gv("H"),
-            gv("2B"), gv("3B"), gv("HR"),
-            gv("R"), gv("RBI"),
-            gv("SB"), gv("CS"),
-            gv("BB"), gv("SO"),
-            gv("HBP"), gv("SF"), gv("IBB"),
-            gv("AVG"), gv("OBP"), gv("SLG"), gv("OPS"),
-            gv("ISO"), gv("BABIP"),
-            gv("wRC+"), gv("WAR"),
-        ))
-        rows_inserted += 1
+    # First row per player wins, as when rows were inserted one at a time
+    cursor.execute("""
+        INSERT OR REPLACE INTO players (player_id, name, team)
+        SELECT player_id, name, team FROM season_batting_stats_stg
+        WHERE rowid IN (SELECT MIN(rowid) FROM season_batting_stats_stg GROUP BY player_id)
+    """)
+    players_added = cursor.rowcount
+
+    cursor.execute(MERGE_SEASON_STATS_SQL)
+    cursor.execute("DROP TABLE season_batting_stats_stg")
 
     conn.commit()
-    print(f"  Loaded {rows_inserted} season stat rows for {len(players_added)} players")
+    print(f"  Loaded {len(df)} season stat rows for {players_added} players")
 
 
 def load_splits(conn, splits_data):
     """Load platoon splits into SQLite."""
     cursor = conn.cursor()
-    rows_inserted = 0
-
-    for row in splits_data:
-        player_id = str(row.get("playerid", row.get("IDfg", "")))
-        name = row.get("Name", "")
-        season = row.get("_season")
-        split = row.get("_split")
-
-        if not player_id or not name or not season:
-            continue
-
-        # Ensure player exists in players table
-        cursor.execute(
-            "INSERT OR IGNORE INTO players (player_id, name, team) VALUES (?, ?, ?)",
-            (player_id, name, row.get("Team", "")),
-        )
+    if not splits_data:
+        print("  Loaded 0 split rows")
+        return
+
+    df = pd.DataFrame(splits_data)
+    if "playerid" not in df.columns and "IDfg" in df.columns:
+        df = df.rename(columns={"IDfg": "playerid"})
+    df = df.reindex(columns=list(SPLITS_COLUMN_MAP)).rename(columns=SPLITS_COLUMN_MAP)
+    df = df[
+        df["player_id"].notna() & df["name"].notna() & (df["name"] != "") & df["season"].notna()
+    ].copy()
+    df["player_id"] = df["player_id"].astype(str)
+    df["season"] = df["season"].astype(int)
+
+    to_staging_table(conn, df, "platoon_splits_stg")
+
+    # Ensure players exist in players table
+    cursor.execute("""
+        INSERT OR IGNORE INTO players (player_id, name, team)
+        SELECT player_id, name, team FROM platoon_splits_stg
+    """)
 
-        cursor.execute("""
-            INSERT OR REPLACE INTO platoon_splits (
-                player_id, season, split, plate_appearances, at_bats,
-                hits, doubles, triples, home_runs, rbi, walks, strikeouts,
-                batting_avg, obp, slg, ops, iso, babip, wrc_plus
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            player_id, season, split,
-            row.get("PA"), row.get("AB"),
-            row.get("H"), row.get("2B"), row.get("3B"),
-            row.get("HR"), row.get("RBI"),
-            row.get("BB"), row.get("SO"),
-            row.get("AVG"), row.get("OBP"), row.get("SLG"), row.get("OPS"),
-            row.get("ISO"), row.get("BABIP"),
-            row.get("wRC+"),
-        ))
-        rows_inserted += 1
+    cursor.execute(MERGE_SPLITS_SQL)
+    cursor.execute("DROP TABLE platoon_splits_stg")
 
     conn.commit()
-    print(f"  Loaded {rows_inserted} split rows")
+    print(f"  Loaded {len(df)} split rows")
 
 
 def get_qualified_player_ids(conn, season, min_pa=400):
@@ -316,7 +374,36 @@ def get_qualified_player_ids(conn, season, min_pa=400):
         "SELECT player_id FROM season_batting_stats WHERE season = ? AND plate_appearances >= ?",
         (season, min_pa),
     )
-    return [row[0] for row in cursor.fetchall()]
+    return [row[0] for row in cursor]
+
+
+GAME_LOG_COLUMNS = [
+    "player_id", "season", "date", "opponent",
+    "plate_appearances", "at_bats", "hits", "doubles", "triples",
+    "home_runs", "runs", "rbi", "walks", "strikeouts",
+    "batting_avg", "obp", "slg", "ops",
+]
+MERGE_GAME_LOGS_SQL = f"""
+    INSERT OR REPLACE INTO game_batting_logs ({", ".join(GAME_LOG_COLUMNS)})
+    SELECT {", ".join(GAME_LOG_COLUMNS)} FROM game_batting_logs_stg
+"""
+
+
+class RateLimiter:
+    """Spaces calls at least 1/per_second apart across threads."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.next_time > now:
+                time.sleep(self.next_time - now)
+                now = self.next_time
+            self.next_time = now + self.interval
 
 
 def pull_game_logs_for_player(player_id, season):
@@ -328,7 +415,7 @@ def pull_game_logs_for_player(player_id, season):
         "type": "0",
         "season": str(season),
     }
-    resp = requests.get(url, params=params)
+    resp = SESSION.get(url, params=params, timeout=REQUEST_TIMEOUT)
     resp.raise_for_status()
     data = resp.json()
     games = data.get("mlb", [])
@@ -336,75 +423,135 @@ def pull_game_logs_for_player(player_id, season):
     return [g for g in games if "2050" not in str(g.get("Date", ""))]
 
 
+def fetch_game_log_rows(limiter, player_id, season):
+    """Fetch one player-season and return game_batting_logs rows (GAME_LOG_COLUMNS order)."""
+    limiter.wait()
+    rows = []
+    for g in pull_game_logs_for_player(player_id, season):
+        # Parse date from HTML link
+        raw_date = str(g.get("Date", ""))
+        match = GAME_DATE_RE.search(raw_date)
+        if not match:
+            continue
+        date = match.group(1)
+
+        rows.append((
+            player_id, season, date, g.get("Opp"),
+            g.get("PA"), g.get("AB"), g.get("H"),
+            g.get("2B"), g.get("3B"), g.get("HR"),
+            g.get("R"), g.get("RBI"), g.get("BB"), g.get("SO"),
+            g.get("AVG"), g.get("OBP"), g.get("SLG"), g.get("OPS"),
+        ))
+    return rows
+
+
+def get_complete_game_log_player_ids(conn, season):
+    """Player IDs whose game log for this season was pulled after the season ended."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT player_id FROM game_log_pulls WHERE season = ? AND pulled_at >= ?",
+        (season, f"{season + 1}-01-01"),
+    )
+    return {row[0] for row in cursor}
+
+
+def load_game_logs(conn, rows, pulled):
+    """Bulk-load game log rows through a staging table and merge them in one statement.
+
+    Records the (player_id, season) pairs in pulled as pulled now, in the
+    same transaction as their rows.
+    """
+    df = pd.DataFrame(rows, columns=GAME_LOG_COLUMNS)
+    to_staging_table(conn, df, "game_batting_logs_stg")
+    cursor = conn.cursor()
+    cursor.execute(MERGE_GAME_LOGS_SQL)
+    cursor.execute("DROP TABLE game_batting_logs_stg")
+    cursor.executemany(
+        "INSERT OR REPLACE INTO game_log_pulls (player_id, season, pulled_at) VALUES (?, ?, datetime('now'))",
+        pulled,
+    )
+    conn.commit()
+
+
 def pull_and_load_game_logs(conn, start_season, end_season):
-    """Pull game logs for qualified batters and load into SQLite."""
+    """Pull game logs for qualified batters and load into SQLite.
+
+    Requests run concurrently over the shared SESSION; all SQLite writes
+    stay on this thread. Player-seasons already pulled after the season
+    ended are skipped, so re-runs only hit FanGraphs for in-progress seasons
+    and new players.
+    """
     print(f"Pulling game logs for {start_season}-{end_season}...")
-    cursor = conn.cursor()
+    limiter = RateLimiter(GAME_LOG_REQUESTS_PER_SEC)
     total_games = 0
 
     for season in range(start_season, end_season + 1):
         player_ids = get_qualified_player_ids(conn, season)
-        print(f"  {season}: {len(player_ids)} qualified batters")
-
-        for i, player_id in enumerate(player_ids):
+        complete = get_complete_game_log_player_ids(conn, season)
+        player_ids = [pid for pid in player_ids if pid not in complete]
+        print(f"  {season}: {len(player_ids)} qualified batters to pull ({len(complete)} already complete)")
+
+        pending = []
+        pulled = []
+        with ThreadPoolExecutor(max_workers=GAME_LOG_WORKERS) as executor:
+            futures = {
+                executor.submit(fetch_game_log_rows, limiter, player_id, season): player_id
+                for player_id in player_ids
+            }
             try:
-                games = pull_game_logs_for_player(player_id, season)
-                for g in games:
-                    # Parse date from HTML link
-                    raw_date = str(g.get("Date", ""))
-                    match = re.search(r'date=(\d{4}-\d{2}-\d{2})', raw_date)
-                    if not match:
+                for i, future in enumerate(as_completed(futures)):
+                    try:
+                        rows = future.result()
+                    except Exception as e:
+                        print(f"    Warning: Failed for player {futures[future]} in {season}: {e}")
                         continue
-                    date = match.group(1)
-
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO game_batting_logs (
-                            player_id, season, date, opponent,
-                            plate_appearances, at_bats, hits, doubles, triples,
-                            home_runs, runs, rbi, walks, strikeouts,
-                            batting_avg, obp, slg, ops
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        player_id, season, date, g.get("Opp"),
-                        g.get("PA"), g.get("AB"), g.get("H"),
-                        g.get("2B"), g.get("3B"), g.get("HR"),
-                        g.get("R"), g.get("RBI"), g.get("BB"), g.get("SO"),
-                        g.get("AVG"), g.get("OBP"), g.get("SLG"), g.get("OPS"),
-                    ))
-                    total_games += 1
-
-                if (i + 1) % 50 == 0:
-                    conn.commit()
-                    print(f"    Pulled {i + 1}/{len(player_ids)} players ({total_games} games)...")
-
-                # Rate limiting: small delay between requests
-                time.sleep(0.2)
 
-            except Exception as e:
-                print(f"    Warning: Failed for player {player_id} in {season}: {e}")
+                    pending.extend(rows)
+                    pulled.append((futures[future], season))
+                    total_games += len(rows)
+
+                    if len(pending) >= GAME_LOG_BATCH_SIZE:
+                        load_game_logs(conn, pending, pulled)
+                        pending.clear()
+                        pulled.clear()
+
+                    if (i + 1) % 50 == 0:
+                        print(f"    Pulled {i + 1}/{len(player_ids)} players ({total_games} games)...")
+            except BaseException:
+                # Don't keep scraping queued players once the run is dead
+                # (SQLite error, Ctrl-C); only in-flight requests finish
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
 
-        conn.commit()
+        if pulled:
+            load_game_logs(conn, pending, pulled)
 
     print(f"  Loaded {total_games} game log rows total")
 
 
 def pull_and_load(start_season, end_season):
     """Pull all data and load into SQLite."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     create_tables(conn)
+    drop_indexes(conn)
 
-    # Season stats via pybaseball
-    season_data = pull_season_stats(start_season, end_season)
-    load_season_stats(conn, season_data)
+    try:
+        # Season stats via pybaseball
+        season_data = pull_season_stats(start_season, end_season)
+        load_season_stats(conn, season_data)
 
-    # Platoon splits via FanGraphs API
-    splits_data = pull_all_splits(start_season, end_season)
-    load_splits(conn, splits_data)
+        # Platoon splits via FanGraphs API
+        splits_data = pull_all_splits(start_season, end_season)
+        load_splits(conn, splits_data)
 
-    # Game logs for qualified batters via FanGraphs API
-    pull_and_load_game_logs(conn, start_season, end_season)
+        # Game logs for qualified batters via FanGraphs API
+        pull_and_load_game_logs(conn, start_season, end_season)
+    finally:
+        # Build indexes once, after everything is loaded -- and even if a
+        # pull failed, so the query engine never runs against an unindexed DB
+        create_indexes(conn)
+        close_sqlite(conn)
 
-    conn.close()
     print(f"\nDone! Database saved to: {DB_PATH}")
 
 
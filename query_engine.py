@@ -9,112 +9,256 @@ The LLM service is abstracted behind a simple interface so it can be
 swapped for a backend server later.
 """
 
+import asyncio
+import hashlib
 import json
 import re
 import sqlite3
 import os
+import queue
+import threading
+from collections import OrderedDict, deque
+from contextlib import closing, contextmanager
+from typing import AsyncIterator, Optional
 import anthropic
 import numpy as np
 import ruptures as rpt
+from scipy.ndimage import uniform_filter1d
 
 from schema_description import SCHEMA_DESCRIPTION
 
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "baseball_stats.db")
 MODEL = "claude-sonnet-4-5-20250929"
+CACHE_CONTROL = {"type": "ephemeral"}
+MAX_CONCURRENT_REQUESTS = 5  # In-flight Claude requests across all engines
 
 
 # --- LLM Service Layer (swap this out for a backend later) ---
 
+# Shared by every LLMService. Both this semaphore and the AsyncAnthropic client's
+# connection pool bind to the first event loop that uses them, so callers must
+# run every question on one long-lived loop (cli_poc.py uses one asyncio.Runner)
+# rather than asyncio.run() per question.
+_LLM_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+# Sentence punctuation only: quotes/apostrophes anywhere, and ?!.,;: at the end of
+# a word. "+" and "." inside a token ("30+", "OPS+", ".300") change the meaning.
+_QUOTES_RE = re.compile(r"[\"'`\u2018\u2019\u201c\u201d]")
+_SENTENCE_PUNCT_RE = re.compile(r"[?!.,;:]+(?=\s|$)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Cleanup for generated SQL: markdown code fences and Python-style # comments
+_FENCE_OPEN_RE = re.compile(r'^```(?:sql)?\s*')
+_FENCE_CLOSE_RE = re.compile(r'\s*```$')
+_HASH_COMMENT_RE = re.compile(r'#[^\n]*')
+
+# Keyword fast path for the router; anything matching neither goes to Claude
+_STREAK_ROUTE_RE = re.compile(
+    r"\b(?:streaks?|streaky|slump\w*|stretch(?:es)?|on fire|hot|hottest|cold|coldest)\b",
+    re.IGNORECASE,
+)
+# Only phrases that can't describe performance over time within a season
+_LOOKUP_ROUTE_RE = re.compile(
+    r"\b(?:how many|led the league|league leaders?|compare|career"
+    r"|(?:vs\.?|versus|against) (?:lefties|righties|lhp|rhp))\b",
+    re.IGNORECASE,
+)
+# Time-within-season wording is streak_finder territory; leave those to Claude
+_TIMELINE_ROUTE_RE = re.compile(
+    r"\b(?:when|over the (?:season|year|course)|during|peak\w*|trend\w*|first half|second half"
+    r"|after the (?:all[- ]star )?break|month\w*|in may|march|april|june|july|august|september|october)\b",
+    re.IGNORECASE,
+)
+
+# Player name / season filters in a streaks query (see _get_all_streaks_for_query)
+_NAME_LIKE_RE = re.compile(r"LIKE\s+'%([^%]+)%'")
+_SEASON_RE = re.compile(r"season\s*=\s*(\d{4})")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, strip sentence punctuation and collapse whitespace so trivial rewordings match."""
+    text = _QUOTES_RE.sub("", question.lower())
+    text = _SENTENCE_PUNCT_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """Bounded LRU cache of LLM outputs keyed on the normalized question.
+
+    The last two exchanges are part of the key because follow-ups like
+    "what about 2023?" only make sense in the context of recent turns, and
+    MODEL is mixed in so switching models never serves stale output.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(question: str, history: list) -> str:
+        recent = list(history)[-2:] if history else []
+        raw = "|".join((MODEL, normalize_question(question), json.dumps(recent)))
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+    def get(self, question: str, history: list):
+        key = self._key(question, history)
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, question: str, history: list, value):
+        key = self._key(question, history)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
 class LLMService:
     """Abstraction over Claude API. Replace this class to route through a backend."""
 
     def __init__(self):
-        self.client = anthropic.Anthropic()  # Uses ANTHROPIC_API_KEY env var
+        self.client = anthropic.AsyncAnthropic()  # Uses ANTHROPIC_API_KEY env var
+        # Router and SQL output depend only on the question and recent context
+        self._route_cache = ResponseCache()
+        self._sql_cache = ResponseCache()
+        self.set_history(())
 
-    def route_query(self, question: str, history: list = None) -> dict:
-        """Classify a question into a query type."""
+    @staticmethod
+    def _system(prompt: str) -> list:
+        """Wrap a system prompt as a cacheable block.
+
+        The prompts are module constants, so the prefix is byte-identical on
+        every call and Anthropic can serve it from the prompt cache.
+        """
+        return [{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}]
+
+    @staticmethod
+    def _replay_history(history) -> list:
+        """Replay previous exchanges, with a cache breakpoint after the last one.
+
+        Older turns only change when a new exchange is added, so everything up
+        to the newest answer is a stable prefix for the next call.
+        """
         messages = []
         if history:
             for prev_q, prev_answer in history:
                 messages.append({"role": "user", "content": prev_q})
                 messages.append({"role": "assistant", "content": prev_answer})
-        messages.append({"role": "user", "content": question})
+            messages[-1]["content"] = [
+                {"type": "text", "text": messages[-1]["content"], "cache_control": CACHE_CONTROL},
+            ]
+        return messages
+
+    def set_history(self, history):
+        """Replay the conversation once per turn for all of that turn's LLM calls."""
+        self._history = tuple(history) if history else ()
+        self._history_messages = self._replay_history(self._history)
+
+    def _build_messages(self, user_content: str, history) -> list:
+        """The replayed history followed by the new user turn."""
+        if (tuple(history) if history else ()) != self._history:
+            self.set_history(history)
+        return self._history_messages + [{"role": "user", "content": user_content}]
 
-        response = self.client.messages.create(
-            model=MODEL,
-            max_tokens=256,
-            system=ROUTER_PROMPT,
-            messages=messages,
-        )
+    @staticmethod
+    def _heuristic_route(question: str) -> Optional[str]:
+        """Route obvious questions by keyword; None means ask Claude.
+
+        Streak vocabulary wins over stat vocabulary, so "OPS during his hot
+        streak" still goes to the streak finder. Questions about how a player
+        did over time ("when did his average peak?") always go to Claude.
+        """
+        if _STREAK_ROUTE_RE.search(question):
+            return "streak_finder"
+        if _TIMELINE_ROUTE_RE.search(question):
+            return None
+        if _LOOKUP_ROUTE_RE.search(question):
+            return "simple_lookup"
+        return None
+
+    async def route_query(self, question: str, history: list = None) -> dict:
+        """Classify a question into a query type."""
+        query_type = self._heuristic_route(question)
+        if query_type:
+            return {"type": query_type}
+
+        cached = self._route_cache.get(question, history)
+        if cached is not None:
+            return cached
+
+        messages = self._build_messages(question, history)
+
+        async with _LLM_SEMAPHORE:
+            response = await self.client.messages.create(
+                model=MODEL,
+                max_tokens=256,
+                system=self._system(ROUTER_PROMPT),
+                messages=messages,
+            )
         text = response.content[0].text.strip()
         try:
-            return json.loads(text)
+            route = json.loads(text)
         except json.JSONDecodeError:
             return {"type": "simple_lookup"}
+        self._route_cache.set(question, history, route)
+        return route
 
-    def generate_sql(self, question: str, history: list = None) -> str:
+    async def generate_sql(self, question: str, history: list = None) -> str:
         """Translate a natural language question into SQL, with conversation context."""
-        messages = []
-        if history:
-            for prev_q, prev_answer in history:
-                messages.append({"role": "user", "content": prev_q})
-                messages.append({"role": "assistant", "content": prev_answer})
-        messages.append({"role": "user", "content": question})
-
-        response = self.client.messages.create(
-            model=MODEL,
-            max_tokens=1024,
-            system=SQL_GENERATION_PROMPT,
-            messages=messages,
-        )
+        cached = self._sql_cache.get(question, history)
+        if cached is not None:
+            return cached
+
+        messages = self._build_messages(question, history)
+
+        async with _LLM_SEMAPHORE:
+            response = await self.client.messages.create(
+                model=MODEL,
+                max_tokens=1024,
+                system=self._system(SQL_GENERATION_PROMPT),
+                messages=messages,
+            )
         sql = response.content[0].text.strip()
         # Strip markdown code fences if Claude adds them
-        sql = re.sub(r'^```(?:sql)?\s*', '', sql)
-        sql = re.sub(r'\s*```$', '', sql)
+        sql = _FENCE_OPEN_RE.sub('', sql)
+        sql = _FENCE_CLOSE_RE.sub('', sql)
         # Strip Python-style # comments (Claude sometimes uses these instead of SQL -- comments)
-        sql = re.sub(r'#[^\n]*', '', sql)
-        return sql.strip()
-
-    def generate_answer(self, question: str, sql: str, results: str, history: list = None) -> str:
-        """Generate a natural language answer from SQL results, with conversation context."""
-        messages = []
-        if history:
-            for prev_q, prev_answer in history:
-                messages.append({"role": "user", "content": prev_q})
-                messages.append({"role": "assistant", "content": prev_answer})
-        messages.append({
-            "role": "user",
-            "content": f"Question: {question}\n\nSQL executed: {sql}\n\nResults:\n{results}",
-        })
+        sql = _HASH_COMMENT_RE.sub('', sql).strip()
+        self._sql_cache.set(question, history, sql)
+        return sql
+
+    async def generate_answer(self, question: str, sql: str, results: str,
+                              history: list = None) -> AsyncIterator[str]:
+        """Stream a natural language answer from SQL results, with conversation context."""
+        messages = self._build_messages(
+            f"Question: {question}\n\nSQL executed: {sql}\n\nResults:\n{results}", history,
+        )
 
-        response = self.client.messages.create(
+        async with _LLM_SEMAPHORE, self.client.messages.stream(
             model=MODEL,
             max_tokens=1024,
-            system=ANSWER_GENERATION_PROMPT,
+            system=self._system(ANSWER_GENERATION_PROMPT),
             messages=messages,
-        )
-        return response.content[0].text.strip()
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
 
-    def describe_streaks(self, question: str, streak_data: str, history: list = None) -> str:
-        """Generate a natural language description of streak data."""
-        messages = []
-        if history:
-            for prev_q, prev_answer in history:
-                messages.append({"role": "user", "content": prev_q})
-                messages.append({"role": "assistant", "content": prev_answer})
-        messages.append({
-            "role": "user",
-            "content": f"Question: {question}\n\nStreak data:\n{streak_data}",
-        })
+    async def describe_streaks(self, question: str, streak_data: str,
+                               history: list = None) -> AsyncIterator[str]:
+        """Stream a natural language description of streak data."""
+        messages = self._build_messages(f"Question: {question}\n\nStreak data:\n{streak_data}", history)
 
-        response = self.client.messages.create(
+        async with _LLM_SEMAPHORE, self.client.messages.stream(
             model=MODEL,
             max_tokens=1024,
-            system=STREAK_ANSWER_PROMPT,
+            system=self._system(STREAK_ANSWER_PROMPT),
             messages=messages,
-        )
-        return response.content[0].text.strip()
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
 
 
 # --- Prompts ---
@@ -224,56 +368,144 @@ Commentary and context go OUTSIDE the grid block.
 
 # --- Query Execution ---
 
+GAME_LOG_DTYPE = np.dtype([
+    ("date", "U10"), ("ab", "f8"), ("h", "f8"), ("d", "f8"), ("t", "f8"),
+    ("hr", "f8"), ("bb", "f8"), ("pa", "f8"), ("so", "f8"),
+])
+
+
+# Counting-stat columns summed per segment, in _compute_segment's unpack order
+SEGMENT_STAT_FIELDS = ("ab", "h", "d", "t", "hr", "bb", "pa", "so")
+
+
+def game_ops(log) -> np.ndarray:
+    """Per-game OPS from a GAME_LOG_DTYPE array; games without an AB or PA score 0."""
+    ab, h, d, t, hr, bb, pa = (log[f] for f in ("ab", "h", "d", "t", "hr", "bb", "pa"))
+    valid = (ab > 0) & (pa > 0)
+    tb = (h - d - t - hr) + 2 * d + 3 * t + 4 * hr
+    obp = np.divide(h + bb, pa, out=np.zeros_like(pa), where=valid)
+    slg = np.divide(tb, ab, out=np.zeros_like(ab), where=valid)
+    return obp + slg
+
+
+def open_connection(db_path: str, query_only: bool = False) -> sqlite3.Connection:
+    """Open a long-lived, autocommit connection tuned for this read-heavy workload.
+
+    journal_mode is left alone: WAL is persistent in the file, and the
+    bundled database has to stay in rollback mode for the read-only iOS app.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000")
+    conn.execute("PRAGMA mmap_size=268435456")
+    if query_only:
+        conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+class ReadPool:
+    """Fixed set of query_only connections, checked out one per query.
+
+    query_only also means generated SQL can never modify the database.
+    reader() blocks until a connection is free, so only call it from worker
+    threads (asyncio.to_thread), never on the event loop.
+    """
+
+    def __init__(self, db_path: str, size: int = 4):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(open_connection(db_path, query_only=True))
+
+    @contextmanager
+    def reader(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
 class QueryEngine:
     """Handles the full question → SQL → answer pipeline."""
 
     MAX_HISTORY = 5  # Keep last 5 exchanges for context
+    HISTORY_TOKEN_BUDGET = 4000  # Cap on estimated tokens across those exchanges
+    MAX_RESULT_ROWS = 50  # Rows of query results passed to Claude
+    READ_POOL_SIZE = 4  # Read-only connections for concurrent queries
 
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
         self.llm = LLMService()
-        self.history = []  # List of (question, answer) tuples
+        self.history = deque(maxlen=self.MAX_HISTORY)  # (question, answer) tuples
+        self._readers = ReadPool(db_path, size=self.READ_POOL_SIZE)
+        self._writer = open_connection(db_path)  # Only for caching fallback segments
+        self._write_lock = threading.Lock()  # Fallbacks run in worker threads
+
+    def close(self):
+        """Close the reader pool and the writer connection."""
+        self._readers.close()
+        self._writer.close()
 
-    def ask(self, question: str) -> str:
+    async def ask(self, question: str) -> str:
         """Answer a natural language baseball question."""
-        # Step 0: Route the query
-        route = self.llm.route_query(question, self.history)
+        return "".join([chunk async for chunk in self.ask_stream(question)]).strip()
+
+    async def ask_stream(self, question: str) -> AsyncIterator[str]:
+        """Answer a question, yielding the answer text as Claude generates it."""
+        self.llm.set_history(self.history)
+
+        # Step 0: Route the query. Both handlers start from the same generated
+        # SQL, so request it alongside the route instead of after it.
+        route, sql = await asyncio.gather(
+            self.llm.route_query(question, self.history),
+            self.llm.generate_sql(question, self.history),
+        )
         query_type = route.get("type", "simple_lookup")
 
         if query_type == "streak_finder":
-            answer = self._handle_streak_query(question)
+            chunks = self._handle_streak_query(question, sql)
         else:
-            answer = self._handle_sql_query(question)
+            chunks = self._handle_sql_query(question, sql)
+
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
 
-        self._add_to_history(question, answer)
-        return answer
+        self._add_to_history(question, "".join(parts).strip())
 
-    def _handle_sql_query(self, question: str) -> str:
+    async def _handle_sql_query(self, question: str, sql: str) -> AsyncIterator[str]:
         """Handle standard text-to-SQL queries."""
-        # Step 1: Generate SQL
-        sql = self.llm.generate_sql(question, self.history)
+        # Step 1: SQL was generated by ask_stream() in parallel with routing
 
         # Handle off-topic / no-data
         if "OFF_TOPIC" in sql:
-            return "I'm a baseball stats engine — ask me about player stats, leaders, averages, and more!"
+            yield "I'm a baseball stats engine — ask me about player stats, leaders, averages, and more!"
+            return
         if "NO_DATA" in sql:
-            return "I don't have the data needed for that question yet. Try asking about 2024 season batting stats!"
+            yield "I don't have the data needed for that question yet. Try asking about 2024 season batting stats!"
+            return
 
         # Step 2: Execute SQL
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            columns = [desc[0] for desc in cursor.description] if cursor.description else []
-            rows = cursor.fetchall()
+            columns, rows = await asyncio.to_thread(self._fetch_results, sql)
         except Exception as e:
-            return f"I had trouble with that query. Could you rephrase? (Error: {e})"
+            yield f"I had trouble with that query. Could you rephrase? (Error: {e})"
+            return
+        # One extra row only tells us the result was cut off
+        truncated = len(rows) > self.MAX_RESULT_ROWS
+        rows = rows[:self.MAX_RESULT_ROWS]
 
         # Streak fallback: if SQL queried streaks table with a performance filter
         # and got 0 results, get all streaks + sliding window best/worst stretches
         is_streak_query = "streaks" in sql.lower()
         if not rows and is_streak_query:
-            all_rows = self._get_all_streaks_for_query(conn, sql)
+            all_rows = await asyncio.to_thread(self._get_all_streaks_for_query, sql)
             if all_rows:
                 streak_columns = ["id", "player_id", "season", "start_date", "end_date",
                                   "num_games", "batting_avg", "obp", "slg", "ops",
@@ -287,14 +519,13 @@ class QueryEngine:
 
                 # Add sliding window fallback for single-segment players
                 if len(all_rows) == 1:
-                    fallback = self._find_best_worst_stretches(conn, all_rows[0])
+                    fallback = await asyncio.to_thread(self._find_best_worst_stretches, all_rows[0])
                     if fallback:
                         streak_data += "\n\n" + fallback
 
-                conn.close()
-                return self.llm.describe_streaks(question, streak_data, self.history)
-
-        conn.close()
+                async for chunk in self.llm.describe_streaks(question, streak_data, self.history):
+                    yield chunk
+                return
 
         # Format results
         if not rows:
@@ -302,42 +533,45 @@ class QueryEngine:
         else:
             header = " | ".join(columns)
             lines = [header, "-" * len(header)]
-            for row in rows[:50]:
+            for row in rows:
                 lines.append(" | ".join(str(v) for v in row))
+            if truncated:
+                lines.append(self._truncation_note())
             results = "\n".join(lines)
 
         # Step 3: Generate answer
         # Use streak-specific prompt when the query hit the streaks table
         if is_streak_query and rows:
-            return self.llm.describe_streaks(question, results, self.history)
-        return self.llm.generate_answer(question, sql, results, self.history)
+            async for chunk in self.llm.describe_streaks(question, results, self.history):
+                yield chunk
+            return
+        async for chunk in self.llm.generate_answer(question, sql, results, self.history):
+            yield chunk
 
-    def _handle_streak_query(self, question: str) -> str:
+    async def _handle_streak_query(self, question: str, sql: str) -> AsyncIterator[str]:
         """Handle streak finder queries using precomputed streak data."""
-        # Use Claude to generate SQL against the streaks table
-        sql = self.llm.generate_sql(question, self.history)
-
+        # sql is Claude's query against the streaks table, generated by ask_stream()
         if "OFF_TOPIC" in sql or "NO_DATA" in sql:
-            return "I don't have streak data for that query. Try asking about a specific player's streaks in 2024 or 2025."
+            yield "I don't have streak data for that query. Try asking about a specific player's streaks in 2024 or 2025."
+            return
 
         # Execute SQL
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            columns = [desc[0] for desc in cursor.description] if cursor.description else []
-            rows = cursor.fetchall()
+            columns, rows = await asyncio.to_thread(self._fetch_results, sql)
         except Exception as e:
-            return f"I had trouble with that streak query. Could you rephrase? (Error: {e})"
+            yield f"I had trouble with that streak query. Could you rephrase? (Error: {e})"
+            return
+        truncated = len(rows) > self.MAX_RESULT_ROWS
+        rows = rows[:self.MAX_RESULT_ROWS]
 
         # If filtered query returned no rows (e.g. asked for "hot" but player had none),
         # check if the player has ANY streak data — if so, they just had no change points.
         used_fallback = False
         if not rows:
-            all_rows = self._get_all_streaks_for_query(conn, sql)
+            all_rows = await asyncio.to_thread(self._get_all_streaks_for_query, sql)
             if not all_rows:
-                conn.close()
-                return "I don't have streak data for that player/season. Streak data is available for qualified batters (400+ PA) in 2024-2025."
+                yield "I don't have streak data for that player/season. Streak data is available for qualified batters (400+ PA) in 2024-2025."
+                return
             rows = all_rows
             columns = ["id", "player_id", "season", "start_date", "end_date", "num_games",
                         "batting_avg", "obp", "slg", "ops", "home_runs", "hits",
@@ -349,20 +583,35 @@ class QueryEngine:
         lines = [header, "-" * len(header)]
         for row in rows:
             lines.append(" | ".join(str(v) for v in row))
+        if truncated:
+            lines.append(self._truncation_note())
         streak_data = "\n".join(lines)
 
         # Fallback: if only 1 segment (no change points), find best/worst stretches via sliding window
         if used_fallback or len(rows) == 1:
-            fallback = self._find_best_worst_stretches(conn, rows[0])
+            fallback = await asyncio.to_thread(self._find_best_worst_stretches, rows[0])
             if fallback:
                 streak_data += "\n\n" + fallback
 
-        conn.close()
-
         # Have Claude describe the streaks
-        return self.llm.describe_streaks(question, streak_data, self.history)
+        async for chunk in self.llm.describe_streaks(question, streak_data, self.history):
+            yield chunk
 
-    def _get_all_streaks_for_query(self, conn, original_sql: str) -> list:
+    def _fetch_results(self, sql: str) -> tuple:
+        """Run generated SQL on a pooled reader, returning (columns, rows).
+
+        Fetches one row past MAX_RESULT_ROWS so callers can tell the result was cut off.
+        Blocks on the pool and on SQLite, so callers run it in a worker thread.
+        """
+        with self._readers.reader() as conn, closing(conn.cursor()) as cursor:
+            cursor.execute(sql)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            return columns, cursor.fetchmany(self.MAX_RESULT_ROWS + 1)
+
+    def _truncation_note(self) -> str:
+        return f"(Only the first {self.MAX_RESULT_ROWS} rows are shown; the query returned more.)"
+
+    def _get_all_streaks_for_query(self, original_sql: str) -> list:
         """When a filtered streak query returns 0 rows, try to get ALL streaks for that player/season.
 
         Extracts the player name and season from the original SQL, then queries
@@ -370,23 +619,23 @@ class QueryEngine:
         """
         try:
             # Extract player name from LIKE '%Name%' pattern
-            name_match = re.search(r"LIKE\s+'%([^%]+)%'", original_sql)
+            name_match = _NAME_LIKE_RE.search(original_sql)
             if not name_match:
                 return []
             player_name = name_match.group(1)
 
             # Extract season (4-digit year near 'season')
-            season_match = re.search(r"season\s*=\s*(\d{4})", original_sql)
+            season_match = _SEASON_RE.search(original_sql)
             season = int(season_match.group(1)) if season_match else 2024
 
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT s.* FROM streaks s
-                JOIN players p ON s.player_id = p.player_id
-                WHERE p.name LIKE ? AND s.season = ?
-                ORDER BY s.start_date
-            """, (f"%{player_name}%", season))
-            return cursor.fetchall()
+            with self._readers.reader() as conn, closing(conn.cursor()) as cursor:
+                cursor.execute("""
+                    SELECT s.* FROM streaks s
+                    JOIN players p ON s.player_id = p.player_id
+                    WHERE p.name LIKE ? AND s.season = ?
+                    ORDER BY s.start_date
+                """, (f"%{player_name}%", season))
+                return cursor.fetchall()
         except Exception:
             return []
 
@@ -396,12 +645,18 @@ class QueryEngine:
     FALLBACK_MAX_SEGMENT = 30
     FALLBACK_ROLLING_WINDOW = 5
 
-    def _find_best_worst_stretches(self, conn, streak_row) -> str:
-        """Re-run PELT with a lower penalty to find subtler streaks.
+    SENSITIVE_SEGMENT_COLUMNS = (
+        "start_date", "end_date", "num_games", "batting_avg", "obp", "slg", "ops",
+        "home_runs", "hits", "at_bats", "walks", "strikeouts", "performance", "season_ops",
+    )
+
+    def _find_best_worst_stretches(self, streak_row) -> str:
+        """Describe the hottest and coldest subtler (Tier 2) streaks for a player-season.
 
         Used as a fallback when the precomputed streaks (penalty=3) found no
-        change points. Returns the hottest and coldest segments between
-        7-30 games.
+        change points. Segments come from streaks_sensitive when the pipeline
+        stored them; otherwise PELT is re-run live with the lower penalty.
+        Returns the hottest and coldest segments between 7-30 games.
         """
         # Extract player_id and season from the streak row (SELECT s.* format)
         player_id = None
@@ -414,43 +669,87 @@ class QueryEngine:
         if not player_id or not season:
             return ""
 
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT date, at_bats, hits, doubles, triples, home_runs,
-                   walks, plate_appearances
-            FROM game_batting_logs
-            WHERE player_id = ? AND season = ?
-            ORDER BY date ASC
-        """, (player_id, season))
-        games = cursor.fetchall()
+        segments = self._load_sensitive_segments(player_id, season)
+        if not segments:
+            segments = self._detect_sensitive_segments(player_id, season)
+            if segments:
+                self._persist_sensitive_segments(player_id, season, segments)
+        if not segments:
+            return ""
+
+        # Find hottest and coldest by OPS deviation from season average
+        season_ops = segments[0]["season_ops"]
+        hottest = max(segments, key=lambda s: s["ops"])
+        coldest = min(segments, key=lambda s: s["ops"])
+
+        def fmt(val):
+            return f"{val:.3f}"
+
+        lines = [f"SENSITIVE STREAK FALLBACK (lower-threshold change-point detection, {self.FALLBACK_MIN_SEGMENT}-{self.FALLBACK_MAX_SEGMENT} game segments):"]
+        lines.append(f"Player season OPS: {fmt(season_ops)}")
+        lines.append(
+            f"Hottest segment: {hottest['start_date']} to {hottest['end_date']} ({hottest['num_games']} games) — "
+            f"{fmt(hottest['batting_avg'])}/{fmt(hottest['obp'])}/{fmt(hottest['slg'])} ({fmt(hottest['ops'])} OPS), "
+            f"{hottest['home_runs']} HR, {hottest['hits']} H in {hottest['at_bats']} AB"
+        )
+        if coldest is not hottest:
+            lines.append(
+                f"Coldest segment: {coldest['start_date']} to {coldest['end_date']} ({coldest['num_games']} games) — "
+                f"{fmt(coldest['batting_avg'])}/{fmt(coldest['obp'])}/{fmt(coldest['slg'])} ({fmt(coldest['ops'])} OPS), "
+                f"{coldest['home_runs']} HR, {coldest['hits']} H in {coldest['at_bats']} AB"
+            )
+        return "\n".join(lines)
+
+    def _load_sensitive_segments(self, player_id: str, season: int) -> list:
+        """Read the precomputed Tier 2 segments for a player-season, in date order."""
+        try:
+            with self._readers.reader() as conn, closing(conn.cursor()) as cursor:
+                cursor.execute(f"""
+                    SELECT {", ".join(self.SENSITIVE_SEGMENT_COLUMNS)}
+                    FROM streaks_sensitive
+                    WHERE player_id = ? AND season = ?
+                    ORDER BY start_date
+                """, (player_id, season))
+                return [dict(zip(self.SENSITIVE_SEGMENT_COLUMNS, row)) for row in cursor.fetchall()]
+        except sqlite3.Error:
+            return []
+
+    def _detect_sensitive_segments(self, player_id: str, season: int) -> list:
+        """Re-run PELT with the lower penalty on a player-season's game logs."""
+        with self._readers.reader() as conn, closing(conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT date, at_bats, hits, doubles, triples, home_runs,
+                       walks, plate_appearances, strikeouts
+                FROM game_batting_logs
+                WHERE player_id = ? AND season = ?
+                ORDER BY date ASC
+            """, (player_id, season))
+            games = cursor.fetchall()
 
         if len(games) < self.FALLBACK_MIN_SEGMENT * 2:
-            return ""
+            return []
 
-        # Compute per-game OPS signal
-        ops_values = []
-        for g in games:
-            date, ab, h, d, t, hr, bb, pa = g
-            if ab and ab > 0 and pa and pa > 0:
-                tb = (h - d - t - hr) + 2 * d + 3 * t + 4 * hr
-                slg = tb / ab
-                obp = (h + bb) / pa
-                ops_values.append(obp + slg)
-            else:
-                ops_values.append(0.0)
-
-        signal = np.array(ops_values)
-        season_ops = np.mean(signal)
+        # Compute per-game OPS signal (NULL counts become NaN and score 0)
+        log = np.array(games, dtype=GAME_LOG_DTYPE)
+        signal = game_ops(log)
+        season_ops = round(float(np.mean(signal)), 3)
 
         # Smooth and run PELT with lower penalty
-        smoothed = np.convolve(signal, np.ones(self.FALLBACK_ROLLING_WINDOW) / self.FALLBACK_ROLLING_WINDOW, mode='same')
+        # Zero-padded centered mean, same edges as np.convolve(mode='same')
+        smoothed = uniform_filter1d(signal, size=self.FALLBACK_ROLLING_WINDOW, mode='constant', cval=0.0)
         smoothed = smoothed.reshape(-1, 1)
 
-        algo = rpt.Pelt(model="l2", min_size=self.FALLBACK_MIN_SEGMENT, jump=1)
+        # A linear kernel gives the same cost as PELT's l2 model, but KernelCPD
+        # runs the exact (jump=1) search in C
+        algo = rpt.KernelCPD(kernel="linear", min_size=self.FALLBACK_MIN_SEGMENT)
         algo.fit(smoothed)
         breakpoints = algo.predict(pen=self.FALLBACK_PENALTY)
 
-        # Build segments and find the hottest/coldest in the 7-30 game range
+        # Prefix sums of the counting stats make each segment total O(1)
+        counts = np.column_stack([np.nan_to_num(log[f]) for f in SEGMENT_STAT_FIELDS])
+        totals = np.vstack([np.zeros(len(SEGMENT_STAT_FIELDS)), np.cumsum(counts, axis=0)])
+
+        # Build segments in the 7-30 game range
         segments = []
         start_idx = 0
         for end_idx in breakpoints:
@@ -458,59 +757,84 @@ class QueryEngine:
                 end_idx = len(games)
             num_games = end_idx - start_idx
             if self.FALLBACK_MIN_SEGMENT <= num_games <= self.FALLBACK_MAX_SEGMENT:
-                seg = self._compute_segment(games, start_idx, end_idx)
+                seg = self._compute_segment(games, totals, start_idx, end_idx)
+                seg["performance"] = self._label_performance(seg["ops"], season_ops)
                 seg["season_ops"] = season_ops
                 segments.append(seg)
             start_idx = end_idx
+        return segments
 
-        if not segments:
-            return ""
-
-        # Find hottest and coldest by OPS deviation from season average
-        hottest = max(segments, key=lambda s: s["ops"])
-        coldest = min(segments, key=lambda s: s["ops"])
+    def _persist_sensitive_segments(self, player_id: str, season: int, segments: list):
+        """Store live-detected segments in streaks_sensitive so the next lookup is a read.
 
-        def fmt(val):
-            return f"{val:.3f}"
+        Only done for player-seasons with a single primary segment, the same
+        ones detect_streaks.py fills the table for. A read-only database just
+        means the segments are recomputed next time.
+        """
+        columns = ("player_id", "season") + self.SENSITIVE_SEGMENT_COLUMNS
+        sql = (f"INSERT INTO streaks_sensitive ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        try:
+            with self._write_lock, closing(self._writer.cursor()) as cursor:
+                cursor.execute("SELECT COUNT(*) FROM streaks WHERE player_id = ? AND season = ?",
+                               (player_id, season))
+                if cursor.fetchone()[0] != 1:
+                    return
+                rows = [(player_id, season) + tuple(seg[c] for c in self.SENSITIVE_SEGMENT_COLUMNS)
+                        for seg in segments]
+                # The connection autocommits, so group the inserts explicitly
+                cursor.execute("BEGIN")
+                try:
+                    cursor.executemany(sql, rows)
+                    cursor.execute("COMMIT")
+                except sqlite3.Error:
+                    cursor.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error:
+            pass
 
-        lines = [f"SENSITIVE STREAK FALLBACK (lower-threshold change-point detection, {self.FALLBACK_MIN_SEGMENT}-{self.FALLBACK_MAX_SEGMENT} game segments):"]
-        lines.append(f"Player season OPS: {fmt(season_ops)}")
-        lines.append(
-            f"Hottest segment: {hottest['start_date']} to {hottest['end_date']} ({hottest['num_games']} games) — "
-            f"{fmt(hottest['avg'])}/{fmt(hottest['obp'])}/{fmt(hottest['slg'])} ({fmt(hottest['ops'])} OPS), "
-            f"{hottest['hr']} HR, {hottest['hits']} H in {hottest['ab']} AB"
-        )
-        if coldest is not hottest:
-            lines.append(
-                f"Coldest segment: {coldest['start_date']} to {coldest['end_date']} ({coldest['num_games']} games) — "
-                f"{fmt(coldest['avg'])}/{fmt(coldest['obp'])}/{fmt(coldest['slg'])} ({fmt(coldest['ops'])} OPS), "
-                f"{coldest['hr']} HR, {coldest['hits']} H in {coldest['ab']} AB"
-            )
-        return "\n".join(lines)
+    @staticmethod
+    def _label_performance(segment_ops, season_ops) -> str:
+        """Hot/cold/average relative to the season, same thresholds as detect_streaks.py."""
+        if season_ops == 0:
+            return "average"
+        ratio = segment_ops / season_ops
+        if ratio >= 1.20:
+            return "hot"
+        elif ratio <= 0.80:
+            return "cold"
+        else:
+            return "average"
 
     @staticmethod
-    def _compute_segment(games, start_idx, end_idx) -> dict:
-        """Compute aggregate stats for a segment of games."""
-        seg = games[start_idx:end_idx]
-        ab = sum(g[1] or 0 for g in seg)
-        h = sum(g[2] or 0 for g in seg)
-        d = sum(g[3] or 0 for g in seg)
-        t = sum(g[4] or 0 for g in seg)
-        hr = sum(g[5] or 0 for g in seg)
-        bb = sum(g[6] or 0 for g in seg)
-        pa = sum(g[7] or 0 for g in seg)
+    def _compute_segment(games, totals, start_idx, end_idx) -> dict:
+        """Compute aggregate stats for games[start_idx:end_idx] from prefix sums."""
+        ab, h, d, t, hr, bb, pa, so = (int(v) for v in totals[end_idx] - totals[start_idx])
         avg = round(h / ab, 3) if ab > 0 else 0
         obp = round((h + bb) / pa, 3) if pa > 0 else 0
         tb = (h - d - t - hr) + 2 * d + 3 * t + 4 * hr
         slg = round(tb / ab, 3) if ab > 0 else 0
         return {
-            "start_date": seg[0][0], "end_date": seg[-1][0],
-            "num_games": len(seg), "avg": avg, "obp": obp, "slg": slg,
-            "ops": round(obp + slg, 3), "hr": hr, "hits": h, "ab": ab, "bb": bb,
+            "start_date": games[start_idx][0], "end_date": games[end_idx - 1][0],
+            "num_games": int(end_idx - start_idx), "batting_avg": avg, "obp": obp, "slg": slg,
+            "ops": round(obp + slg, 3), "home_runs": hr, "hits": h, "at_bats": ab,
+            "walks": bb, "strikeouts": so,
         }
 
     def _add_to_history(self, question: str, answer: str):
-        """Track conversation history, keeping only the last N exchanges."""
+        """Track conversation history, keeping the last N exchanges within a token budget.
+
+        The deque drops exchanges beyond MAX_HISTORY; older exchanges are also
+        dropped while the total is over HISTORY_TOKEN_BUDGET, but the newest
+        one is always kept so follow-ups have context.
+        """
         self.history.append((question, answer))
-        if len(self.history) > self.MAX_HISTORY:
-            self.history = self.history[-self.MAX_HISTORY:]
+        tokens = sum(self._estimate_tokens(q) + self._estimate_tokens(a) for q, a in self.history)
+        while tokens > self.HISTORY_TOKEN_BUDGET and len(self.history) > 1:
+            old_q, old_a = self.history.popleft()
+            tokens -= self._estimate_tokens(old_q) + self._estimate_tokens(old_a)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count (~4 characters per token), good enough for budgeting."""
+        return len(text) // 4